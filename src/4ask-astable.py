@@ -18,6 +18,9 @@
 
 import numpy as np
 import ldpc
+import channel
+import llrtable
+import profiler
 import time
 from astable import SaS
 
@@ -29,6 +32,7 @@ gammas = [.61, .6, .59]   # Échelle du bruit
 minberrors = 5000               # min erreurs bit à observer
 minwerrors = 1000               # min erreurs mot à observer
 bpitmax = 100                   # max itérations
+profile = False                 # Profilage par phase
 
 codefile = '../data/MacKay20000.ldpc' # Fichier LDPC
 ppevery = 1000       # Affichage temporaire tout les 10 mots
@@ -48,6 +52,8 @@ illr = np.zeros(code.length)               # LLR de l'entrée
 ollr = np.zeros(code.length)               # Mot décodé
 
 rng = np.random.default_rng()   # Générateur aléatoire
+ask = channel.ASK(['11', '10', '00', '01'], sw.size, rng) # Modulation
+prof = profiler.Profiler() if profile else profiler.NoProfiler()
 
 
 ## * LLRs
@@ -82,36 +88,43 @@ print('# Gamma #it/cw  #codeword            '
 
 
 ## * Simulation
-N = SaS(alpha)                  # v.a. du bruit
+N = SaS(alpha, rng)             # v.a. du bruit
 
 tic = time.time()
 for gamma in gammas:
+  T0 = llrtable.sas(lambda y: L0(y, N, gamma), 3, gamma) # Tables
+  T1 = llrtable.sas(lambda y: L1(y, N, gamma), 3, gamma) # des LLR
   ncw = 0                       # Nombre de mots transmis
   nbe = 0                       # Nombre d'erreurs bit
   nwe = 0                       # Nombre d'erreurs mot
   its = 0                       # Nombre d'itérations
+  prof.reset()
   
   while nbe < minberrors or nwe < minwerrors:
     ncw += 1
 
-    sw = -3 + 2 * rng.integers(4, size=sw.shape)
-    rw = sw + N.samples(gamma=gamma, size=sw.shape)
-    off[:sw.size] = sw < 0         # bit 0
-    off[sw.size:] = np.abs(sw) > 2 # bit 1
+    ask(sw, off)                  # Symboles et offset
+    N.samples(gamma, out=rw)
+    rw += sw
+    prof.lap('noise')
 
     # Calcul du LLR avant décodage
-    illr[:sw.size] = L0(rw, N, gamma)
-    illr[sw.size:] = L1(rw, N, gamma)
-    illr[off] = -illr[off]
-    
+    T0(rw, out=illr[:sw.size])
+    T1(rw, out=illr[sw.size:])
+    np.negative(illr, out=illr, where=off)
+    prof.lap('llr')
+
     # Décodage
     it = code.bp(illr, ollr, bpitmax)
     its += it
+    prof.lap('bp')
+    prof.count(it, code.updates)
 
     # Comptage des erreurs
-    err = np.sum(ollr <= 0.0)
+    err = code.errors(ollr)
     nbe += err
     if err > 0: nwe += 1
+    prof.lap('count')
 
     # Affichage
     if 0 == ncw % ppevery:
@@ -127,6 +140,7 @@ for gamma in gammas:
         f'{its/ncw: 7.2f}  {ncw:<20d} '
         f'{nbe/ncw/code.length:<9.2e} {nbe:<10d} '
         f'{nwe/ncw:<9.2e} {nwe:<10d}')
+  prof.report()
 
 tac = time.time()
 print(f"Time: {tac - tic}")
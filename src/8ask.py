@@ -21,6 +21,9 @@
 import numpy as np
 from scipy.special import logsumexp
 import ldpc
+import channel
+import llrtable
+import profiler
 import time
 
 
@@ -30,6 +33,7 @@ ebnos = np.linspace(3, 8, 6)    # Le rapport signal à bruit
 minberrors = 1000               # min erreurs bit à observer
 minwerrors = 100                # min erreurs mot à observer
 bpitmax = 100                   # max itérations
+profile = False                 # Profilage par phase
 
 codefile = '../data/MacKay96-963.ldpc' # Fichier LDPC
 ppevery = 1000       # Affichage temporaire tout les 10 mots
@@ -49,29 +53,32 @@ illr = np.zeros(code.length)               # LLR de l'entrée
 ollr = np.zeros(code.length)               # Mot décodé
 
 rng = np.random.default_rng()   # Générateur aléatoire
+ask = channel.ASK(['110', '111', '101', '100', '000', '001', '010', '011'],
+                  sw.size, rng) # Modulation
+prof = profiler.Profiler() if profile else profiler.NoProfiler()
 
 
 ## * LLRs
 
 def L0(y, sigma):
-  num = logsumexp(-np.vstack(((rw - 1)/sigma, (rw - 3)/sigma,
-                              (rw - 5)/sigma, (rw - 7)/sigma))**2, axis=0)
-  den = logsumexp(-np.vstack(((rw + 1)/sigma, (rw + 3)/sigma,
-                              (rw + 5)/sigma, (rw + 7)/sigma))**2, axis=0)
+  num = logsumexp(-np.vstack(((y - 1)/sigma, (y - 3)/sigma,
+                              (y - 5)/sigma, (y - 7)/sigma))**2, axis=0)
+  den = logsumexp(-np.vstack(((y + 1)/sigma, (y + 3)/sigma,
+                              (y + 5)/sigma, (y + 7)/sigma))**2, axis=0)
   return num - den
 
 def L1(y, sigma):
-  num = logsumexp(-np.vstack(((rw - 1)/sigma, (rw - 3)/sigma,
-                              (rw + 1)/sigma, (rw + 3)/sigma))**2, axis=0)
-  den = logsumexp(-np.vstack(((rw - 5)/sigma, (rw - 7)/sigma,
-                              (rw + 5)/sigma, (rw + 7)/sigma))**2, axis=0)
+  num = logsumexp(-np.vstack(((y - 1)/sigma, (y - 3)/sigma,
+                              (y + 1)/sigma, (y + 3)/sigma))**2, axis=0)
+  den = logsumexp(-np.vstack(((y - 5)/sigma, (y - 7)/sigma,
+                              (y + 5)/sigma, (y + 7)/sigma))**2, axis=0)
   return num - den
 
 def L2(y, sigma):
-  num = logsumexp(-np.vstack(((rw - 1)/sigma, (rw - 5)/sigma,
-                              (rw + 1)/sigma, (rw + 7)/sigma))**2, axis=0)
-  den = logsumexp(-np.vstack(((rw - 3)/sigma, (rw - 7)/sigma,
-                              (rw + 3)/sigma, (rw + 5)/sigma))**2, axis=0)
+  num = logsumexp(-np.vstack(((y - 1)/sigma, (y - 5)/sigma,
+                              (y + 1)/sigma, (y + 7)/sigma))**2, axis=0)
+  den = logsumexp(-np.vstack(((y - 3)/sigma, (y - 7)/sigma,
+                              (y + 3)/sigma, (y + 5)/sigma))**2, axis=0)
   return num - den
 
 
@@ -101,38 +108,42 @@ for ebno in ebnos:
   # voie (I ou Q).
   sigma2 = 10 ** (-ebno / 10.0) * 7 / 4 / code.rate
   sigma = np.sqrt(sigma2)       # Ecart-type du bruit
+  T0 = llrtable.awgn(lambda y: L0(y, sigma), 7, sigma) # Tables
+  T1 = llrtable.awgn(lambda y: L1(y, sigma), 7, sigma) # des LLR
+  T2 = llrtable.awgn(lambda y: L2(y, sigma), 7, sigma)
   
   ncw = 0                       # Nombre de mots transmis
   nbe = 0                       # Nombre d'erreurs bit
   nwe = 0                       # Nombre d'erreurs mot
   its = 0                       # Nombre d'itérations
+  prof.reset()
   
   while nbe < minberrors or nwe < minwerrors:
     # Émission d'un mot de code avec offset en ASK
     ncw += 1
 
-    sw = -7 + 2 * rng.integers(8, size=sw.shape)
-    rw = sw + rng.normal(scale=sigma, size=sw.shape)
-    off[:sw.size] = sw < 0                  # bit 0
-    off[sw.size:2*sw.size] = np.abs(sw) > 4 # bit 1
-    off[2*sw.size:] = (sw > 6) \
-                    | ((2 < sw) & (sw < 4)) \
-                    | ((-6 < sw) & (sw < -2)) # bit 2
+    ask(sw, off)                  # Symboles et offset
+    channel.awgn(sw, sigma, rng, out=rw)
+    prof.lap('noise')
 
     # Calcul du LLR avant décodage
-    illr[:sw.size] = L0(rw, sigma)          # bit 0
-    illr[sw.size:2*sw.size] = L1(rw, sigma) # bit 1
-    illr[2*sw.size:] = L2(rw, sigma)        # bit 2
-    illr[off] = -illr[off]
-    
+    T0(rw, out=illr[:sw.size])          # bit 0
+    T1(rw, out=illr[sw.size:2*sw.size]) # bit 1
+    T2(rw, out=illr[2*sw.size:])        # bit 2
+    np.negative(illr, out=illr, where=off)
+    prof.lap('llr')
+
     # Décodage
     it = code.bp(illr, ollr, bpitmax)
     its += it
+    prof.lap('bp')
+    prof.count(it, code.updates)
 
     # Comptage des erreurs
-    err = np.sum(ollr <= 0.0)
+    err = code.errors(ollr)
     nbe += err
     if err > 0: nwe += 1
+    prof.lap('count')
 
     # Affichage
     if 0 == ncw % ppevery:
@@ -148,6 +159,7 @@ for ebno in ebnos:
         f'{its/ncw: 7.2f}  {ncw:<20d} '
         f'{nbe/ncw/code.length:<9.2e} {nbe:<10d} '
         f'{nwe/ncw:<9.2e} {nwe:<10d}')
+  prof.report()
 
 tac = time.time()
 print(f"Time: {tac - tic}")
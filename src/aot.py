@@ -0,0 +1,34 @@
+### Compilation à l'avance des noyaux de décodage (`check` et
+### `bp`) dans le module `ldpc_aot` (extension C placée à côté
+### de ldpc.py). Une fois compilé, ldpc.py l'utilise à la
+### place de ces deux fonctions numba pour des LLR float64
+### contigus. Les autres noyaux (lecture des codes, comptage
+### des erreurs, autres décodeurs) restent compilés à la
+### volée : sans cache numba, le premier lancement paie encore
+### leur compilation (de l'ordre de la seconde).
+###
+### numba.pycc est en voie d'obsolescence (« pending
+### deprecation ») dans numba : ce module disparaîtra avec
+### lui, et ldpc.py retombe alors sur les noyaux numba en
+### cache, sans autre changement.
+###
+###   python aot.py
+
+from numba.pycc import CC
+import ldpc
+
+cc = CC('ldpc_aot')
+cc.verbose = True
+
+for suffix, index in (('i8', 'int64'), ('i4', 'int32')):
+  cc.export(f'check_{suffix}',
+            f'b1({index}[::1], {index}[::1], f8[::1])') \
+    (ldpc.numba_check.py_func)
+  cc.export(f'bp_{suffix}',
+            f'UniTuple(i8, 2)({index}[::1], {index}[::1], f8[::1], '
+            f'f8[::1], f8[::1], f8[::1], i8)') \
+    (ldpc.numba_bp.py_func)
+
+
+if __name__ == '__main__':
+  cc.compile()
@@ -11,16 +11,31 @@ def _pdf(xs, alpha):
   return levy_stable.pdf(xs, alpha=alpha, beta=0)
 
 
-def _samples(rng, alpha, size=None, eps=1e-5):
-  """Génère des échantillons d'une loi alpha-stable symétrique
-  de paramètre `alpha` et d'un générateur `rng`. On suppose
-  1 < alpha < 2. Pour les lois de Cauchy et de Gauss, il
-  faut utiliser les méthodes classiques.
+def _samples(rng, alpha, out, phi, w):
+  """Génère dans `out` des échantillons d'une loi alpha-stable
+  symétrique de paramètre `alpha` et d'un générateur `rng`,
+  avec `phi` et `w` des tableaux de travail de même taille. On
+  suppose 1 < alpha < 2. Pour les lois de Cauchy et de Gauss,
+  il faut utiliser les méthodes classiques.
   """
-  phi = (rng.uniform(size=size) - 0.5) * np.pi
-  w = -np.log(rng.uniform(size=size))
-  return np.sin(alpha * phi) / np.power(np.cos(phi), 1.0/alpha) \
-    * np.power((np.cos((1.0-alpha)*phi)/w), 1.0/alpha-1)
+  rng.random(out=phi)           # phi uniforme sur ]-pi/2, pi/2[
+  phi -= 0.5
+  phi *= np.pi
+  rng.standard_exponential(out=w) # w exponentielle
+
+  # w <- (cos((1-alpha) phi) / w)^(1/alpha - 1) / cos(phi)^(1/alpha)
+  np.multiply(phi, 1.0 - alpha, out=out)
+  np.cos(out, out=out)
+  np.divide(out, w, out=w)
+  np.power(w, 1.0/alpha - 1, out=w)
+  np.cos(phi, out=out)
+  np.power(out, 1.0/alpha, out=out)
+  np.divide(w, out, out=w)
+
+  # out <- sin(alpha phi) w
+  np.multiply(phi, alpha, out=phi)
+  np.sin(phi, out=phi)
+  return np.multiply(phi, w, out=out)
 
 
 class SaS:
@@ -28,6 +43,7 @@ class SaS:
     assert 1.0 < alpha < 2.0
     self.alpha = alpha
     self.rng = rng or np.random.default_rng()
+    self._phi = self._w = None  # Tableaux de travail des tirages
 
     # Construction de la lut
     self.xlut = np.linspace(0, 0.999999 * np.pi/2, 2000)
@@ -36,13 +52,23 @@ class SaS:
     self.yplut = np.log(self.ylut)
     
     
-  def samples(self, gamma=1.0, size=None):
-    return gamma * _samples(self.rng, self.alpha, size)
+  def samples(self, gamma=1.0, size=None, out=None):
+    """Retourne des échantillons d'échelle `gamma`, écrits dans
+    `out` s'il est fourni. Les tableaux de travail sont gardés
+    d'un appel à l'autre tant que la taille ne change pas."""
+    scalar = out is None and size is None
+    if out is None: out = np.empty(() if size is None else size)
+    if self._phi is None or self._phi.shape != out.shape:
+      self._phi = np.empty(out.shape)
+      self._w = np.empty(out.shape)
+    _samples(self.rng, self.alpha, out, self._phi, self._w)
+    if gamma != 1.0: out *= gamma
+    return out[()] if scalar else out
 
   
   def pdf(self, x, gamma=1.0):
     t = np.arctan(np.abs(x) / gamma) / self.xlut[1]
-    i = np.array(t, dtype=np.int)
+    i = np.array(t, dtype=int)
     f = t - i
     i[i >= self.xlut.size - 1] = self.xlut.size - 3
     p = self.ylut[i.astype(int)] * (1-f) + self.ylut[i.astype(int)+1] * f
@@ -52,7 +78,7 @@ class SaS:
   
   def logpdf(self, x, gamma=1.0):
     t = np.arctan(np.abs(x) / gamma) / self.xlut[1]
-    i = np.array(t, dtype=np.int)
+    i = np.array(t, dtype=int)
     f = t - i
     i[i >= self.xlut.size - 1] = self.xlut.size - 2
     p = self.yplut[i.astype(int)] * (1-f) + self.yplut[i.astype(int)+1] * f - np.log(gamma)
@@ -0,0 +1,340 @@
+### Mesures de performance des points chauds de la
+### simulation : lecture des codes, compilation JIT et
+### décodage, canal et calcul des LLR.
+
+### Les mesures sont enregistrées dans un fichier JSON pour
+### être comparées à une référence précédente. Une mesure
+### qui se dégrade de plus d'un seuil relatif est signalée et
+### le programme se termine alors avec un code d'erreur, de
+### même qu'un démarrage au-delà de l'objectif `coldstart`.
+###
+###   python bench.py -o ../results/bench-ref.json
+###   python bench.py -b ../results/bench-ref.json -t 0.2
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from scipy.special import logsumexp
+import channel
+import ldpc
+import llrtable
+import pipeline
+from astable import SaS
+
+
+## * Paramètres des mesures
+
+codefiles = {                   # Codes mesurés
+  'Hamming743': '../data/Hamming743.ldpc',
+  'MacKay96-963': '../data/MacKay96-963.ldpc',
+  'MacKay20000': '../data/MacKay20000.ldpc',
+}
+ebno = 3.0                      # Rapport signal à bruit fixe
+bpitmax = 100                   # max itérations
+window = 0.3                    # Durée d'une fenêtre de mesure (s)
+nframes = 256                   # Nombre de trames pré-calculées
+nsamples = 100000               # Taille des tirages du canal
+alpha = 1.6                     # Exposant du bruit SaS
+gamma = 0.3                     # Échelle du bruit SaS
+nslots = None                   # Emplacements de bp_slots (un par fil)
+repeat = 5                      # Fenêtres par mesure (médiane)
+coldstart = 1.0                 # Démarrage à froid visé (s)
+
+
+## * Décodeurs mesurés
+
+decoders = {
+  'bp': lambda code, illr, ollr, maxiter: code.bp(illr, ollr, maxiter),
+  'bp-table': lambda code, illr, ollr, maxiter:
+    code.bp(illr, ollr, maxiter, 'table'),
+  'gallager': lambda code, illr, ollr, maxiter:
+    code.gallager(illr, ollr, maxiter),
+  'gdbf': lambda code, illr, ollr, maxiter: code.gdbf(illr, ollr, maxiter),
+  'bfbp': lambda code, illr, ollr, maxiter: code.bfbp(illr, ollr, maxiter),
+  'rbp': lambda code, illr, ollr, maxiter:
+    code.bp(illr, ollr, maxiter, schedule='residual'),
+}
+
+
+## * Démappeurs ASK (identiques à ceux des simulations)
+
+def L0_4ask(y, sigma):
+  num = logsumexp(-np.vstack(((y - 1)/sigma, (y - 3)/sigma))**2, axis=0)
+  den = logsumexp(-np.vstack(((y + 1)/sigma, (y + 3)/sigma))**2, axis=0)
+  return num - den
+
+def L1_4ask(y, sigma):
+  num = logsumexp(-np.vstack(((y - 1)/sigma, (y + 1)/sigma))**2, axis=0)
+  den = logsumexp(-np.vstack(((y - 3)/sigma, (y + 3)/sigma))**2, axis=0)
+  return num - den
+
+def L2_8ask(y, sigma):
+  num = logsumexp(-np.vstack(((y - 1)/sigma, (y - 5)/sigma,
+                              (y + 1)/sigma, (y + 7)/sigma))**2, axis=0)
+  den = logsumexp(-np.vstack(((y - 3)/sigma, (y - 7)/sigma,
+                              (y + 3)/sigma, (y + 5)/sigma))**2, axis=0)
+  return num - den
+
+def L0_sas(y, N, gamma):
+  num = np.log(N.pdf(y - 1, gamma) + N.pdf(y - 3, gamma))
+  den = np.log(N.pdf(y + 1, gamma) + N.pdf(y + 3, gamma))
+  return num - den
+
+
+## * Outils de mesure
+
+def best(f, repeat=repeat):
+  """Retourne la meilleure durée sur `repeat` appels de `f`."""
+  times = []
+  for _ in range(repeat):
+    tic = time.perf_counter()
+    f()
+    times.append(time.perf_counter() - tic)
+  return min(times)
+
+
+def median(f, repeat=repeat):
+  """Retourne la durée médiane d'un appel de `f`. Le nombre
+  d'appels par fenêtre est calibré pour qu'une fenêtre dure au
+  moins `window` ; les `repeat` fenêtres font le même travail."""
+  n = 0
+  tic = time.perf_counter()
+  while time.perf_counter() - tic < window:
+    f()
+    n += 1
+  times = []
+  for _ in range(repeat):
+    tic = time.perf_counter()
+    for _ in range(n): f()
+    times.append((time.perf_counter() - tic) / n)
+  return float(np.median(times))
+
+
+def calibrate(f):
+  """Retourne le nombre de trames, entre 1 et `nframes`, que
+  `f(k)` décode en une fenêtre, `f(k)` décodant la trame `k`."""
+  n = 0
+  tic = time.perf_counter()
+  while n < nframes and time.perf_counter() - tic < window:
+    f(n)
+    n += 1
+  return n
+
+
+def frames(code, rng):
+  """Pré-calcule des LLR BPSK sur canal gaussien à `ebno` pour
+  que le décodage seul soit mesuré."""
+  sigma2 = 10 ** (-ebno / 10.0) / 2 / code.rate
+  rw = 1.0 + rng.normal(scale=np.sqrt(sigma2), size=(nframes, code.length))
+  return 2.0 * rw / sigma2
+
+
+def bench_startup(results):
+  """Mesure le démarrage d'un processus neuf jusqu'au premier
+  décodage, sans cache numba puis avec le cache sur disque, et
+  retourne si ce dernier tient dans l'objectif `coldstart`."""
+  script = ('import numpy as np, ldpc\n'
+            f'c = ldpc.LDPC({codefiles["Hamming743"]!r})\n'
+            'c.bp(np.ones(c.length), np.zeros(c.length), 10)\n')
+  run = lambda env: subprocess.run([sys.executable, '-c', script],
+                                   env=env, check=True)
+  with tempfile.TemporaryDirectory() as cache:
+    env = dict(os.environ, NUMBA_CACHE_DIR=cache)
+    t = best(lambda: run(env), repeat=1)
+  results['startup/nocache/s'] = t
+  print(f'startup   no cache       {t:10.3f} s')
+
+  run(os.environ)               # Remplit le cache si besoin
+  t = best(lambda: run(os.environ))
+  results['startup/cached/s'] = t
+  ok = t <= coldstart
+  status = 'ok' if ok else f'ABOVE TARGET {coldstart} s'
+  print(f'startup   cached         {t:10.3f} s  {status}')
+  return ok
+
+
+def bench_parse(results):
+  for name, codefile in codefiles.items():
+    t = median(lambda: ldpc.LDPC(codefile))
+    results[f'parse/{name}/s'] = t
+    print(f'parse     {name:<14s} {t*1e3:10.3f} ms')
+
+
+def windows(f, m):
+  """Retourne le débit médian en trames/s et le nombre moyen
+  d'itérations de `repeat` fenêtres où `f(k)` décode les
+  trames k = 0, ..., m-1."""
+  rates = []
+  its = 0
+  for _ in range(repeat):
+    tic = time.perf_counter()
+    for k in range(m): its += f(k)
+    rates.append(m / (time.perf_counter() - tic))
+  return float(np.median(rates)), its / (repeat * m)
+
+
+def bench_decode(results, rng):
+  compiled = set()
+  for name, codefile in codefiles.items():
+    code = ldpc.LDPC(codefile)
+    llrs = frames(code, rng)
+    ollr = np.zeros(code.length)
+    for dec, f in decoders.items():
+      decode = lambda k: f(code, llrs[k], ollr, bpitmax)
+
+      # Premier appel : compilation JIT incluse
+      tic = time.perf_counter()
+      decode(0)
+      first = time.perf_counter() - tic
+
+      # Régime permanent
+      m = calibrate(decode)
+      if dec == 'bp': mbp = m
+      rate, its = windows(decode, m)
+      results[f'decode/{dec}/{name}/frames_per_s'] = rate
+      if dec not in compiled:
+        results[f'jit/{dec}/s'] = max(first - 1.0 / rate, 0.0)
+        compiled.add(dec)
+      print(f'decode    {name:<14s} {dec:<10s} '
+            f'{rate:12.1f} frames/s  {its:6.2f} it/cw  '
+            f'1st call {first*1e3:9.3f} ms')
+
+    # Décodage par emplacements des mêmes trames que 'bp'
+    for _ in code.bp_slots(llrs[:1], bpitmax, nslots): pass
+    rates = []
+    its = 0
+    for _ in range(repeat):
+      tic = time.perf_counter()
+      for it, _ in code.bp_slots(llrs[:mbp], bpitmax, nslots): its += it
+      rates.append(mbp / (time.perf_counter() - tic))
+    rate = float(np.median(rates))
+    results[f'decode/slots/{name}/frames_per_s'] = rate
+    print(f'decode    {name:<14s} {"slots":<10s} '
+          f'{rate:12.1f} frames/s  {its/repeat/mbp:6.2f} it/cw')
+
+
+def bench_stream(results, rng):
+  """Compare la boucle séquentielle canal, LLR puis décodage au
+  décodage en flux qui recouvre canal et décodage."""
+  for name in ('MacKay96-963', 'MacKay20000'):
+    code = ldpc.LDPC(codefiles[name])
+    sigma2 = 10 ** (-ebno / 10.0) / 2 / code.rate
+    sigma = np.sqrt(sigma2)
+    cw = np.ones(code.length)
+    def fill(illr):
+      channel.awgn(cw, sigma, rng, out=illr)
+      illr *= 2.0 / sigma2
+
+    illr = np.zeros(code.length)
+    ollr = np.zeros(code.length)
+    def sequential(k):
+      fill(illr)
+      return code.bp(illr, ollr, bpitmax)
+    m = calibrate(sequential)
+    seq, _ = windows(sequential, m)
+
+    rates = []
+    for _ in range(repeat):
+      tic = time.perf_counter()
+      for k, _ in zip(range(m), pipeline.stream(code, fill, bpitmax)): pass
+      rates.append(m / (time.perf_counter() - tic))
+    par = float(np.median(rates))
+
+    results[f'stream/sequential/{name}/frames_per_s'] = seq
+    results[f'stream/pipeline/{name}/frames_per_s'] = par
+    print(f'stream    {name:<14s} {seq:12.1f} frames/s sequential '
+          f'{par:12.1f} frames/s pipeline')
+
+
+def bench_channel(results, rng):
+  sigma = 0.8
+  sigma2 = sigma ** 2
+  rw = 1.0 + rng.normal(scale=sigma, size=nsamples)
+  N = SaS(alpha, rng)
+  T0 = llrtable.awgn(lambda y: L0_4ask(y, sigma), 3, sigma)
+  S0 = llrtable.sas(lambda y: L0_sas(y, N, gamma), 3, gamma)
+  llr = np.zeros(nsamples)
+  sw = np.zeros(nsamples)
+  off = np.zeros(2 * nsamples, dtype=bool)
+  ask = channel.ASK(['11', '10', '00', '01'], nsamples, rng)
+  cases = {
+    'awgn-noise': lambda: rng.normal(scale=sigma, size=nsamples),
+    'awgn-out': lambda: channel.awgn(rw, sigma, rng, out=llr),
+    '4ask-symbols': lambda: ask(sw, off),
+    'bpsk-llr': lambda: 2.0 * rw / sigma2,
+    'bpsk-llr-out': lambda: np.multiply(rw, 2.0 / sigma2, out=llr),
+    '4ask-L0': lambda: L0_4ask(rw, sigma),
+    '4ask-L1': lambda: L1_4ask(rw, sigma),
+    '8ask-L2': lambda: L2_8ask(rw, sigma),
+    '4ask-L0-table': lambda: T0(rw, out=llr),
+    'sas-samples': lambda: N.samples(gamma=gamma, size=nsamples),
+    'sas-samples-out': lambda: N.samples(gamma, out=llr),
+    'sas-pdf': lambda: N.pdf(rw, gamma),
+    'sas-logpdf': lambda: N.logpdf(rw, gamma),
+    'sas-L0': lambda: L0_sas(rw, N, gamma),
+    'sas-L0-table': lambda: S0(rw, out=llr),
+  }
+  for name, f in cases.items():
+    t = median(f) / nsamples
+    results[f'channel/{name}/ns_per_sample'] = t * 1e9
+    print(f'channel   {name:<14s} {t*1e9:10.2f} ns/sample')
+
+
+## * Comparaison avec une référence
+
+def compare(results, baseline, threshold):
+  """Retourne la liste des mesures qui se dégradent de plus de
+  `threshold` (relatif) par rapport à `baseline`. Les débits
+  (`.../frames_per_s`) doivent croître, les durées décroître.
+  Les temps de compilation `jit/...`, déduits d'un seul premier
+  appel, sont affichés mais ne comptent pas."""
+  regressions = []
+  for key, ref in baseline.items():
+    if key not in results or ref <= 0.0: continue
+    new = results[key]
+    if key.endswith('frames_per_s'): change = ref / new - 1.0
+    else: change = new / ref - 1.0
+    regression = change > threshold and not key.startswith('jit/')
+    flag = 'REGRESSION' if regression else ''
+    print(f'{key:<45s} {ref:12.4g} -> {new:12.4g} {change:+8.1%} {flag}')
+    if regression: regressions.append(key)
+  return regressions
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('-o', '--output', help='fichier JSON des résultats')
+  parser.add_argument('-b', '--baseline', help='fichier JSON de référence')
+  parser.add_argument('-t', '--threshold', type=float, default=0.2,
+                      help='seuil relatif de régression (défaut 0.2)')
+  args = parser.parse_args()
+
+  rng = np.random.default_rng(0)
+  results = {}
+  startup = bench_startup(results)
+  bench_parse(results)
+  bench_decode(results, rng)
+  bench_stream(results, rng)
+  bench_channel(results, rng)
+
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump(results, f, indent=2, sort_keys=True)
+
+  if args.baseline:
+    with open(args.baseline) as f:
+      baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+      print(f'# {len(regressions)} regression(s) above {args.threshold:.0%}')
+  else:
+    regressions = []
+
+  if not startup:
+    print(f'# cached startup above the {coldstart} s target')
+  if regressions or not startup: sys.exit(1)
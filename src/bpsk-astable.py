@@ -4,6 +4,8 @@
 
 import numpy as np
 import ldpc
+import llrtable
+import profiler
 import time
 from astable import SaS
 
@@ -15,6 +17,7 @@ gammas = np.linspace(.01, .5, 4) # Échelle du bruit
 minberrors = 5000               # min erreurs bit à observer
 minwerrors = 100                # min erreurs mot à observer
 bpitmax = 100                   # max itérations
+profile = False                 # Profilage par phase
 
 codefile = '../data/MacKay96-963.ldpc' # Fichier LDPC
 ppevery = 1000       # Affichage temporaire tout les 10 mots
@@ -33,6 +36,7 @@ illr = np.zeros_like(cw)        # LLR de l'entrée
 ollr = np.zeros_like(cw)        # Mot décodé
 
 rng = np.random.default_rng()   # Générateur aléatoire
+prof = profiler.Profiler() if profile else profiler.NoProfiler()
 
 
 ## * Affichage des paramètres
@@ -52,33 +56,42 @@ print('# Gamma #it/cw  #codeword            '
 
 
 ## * Simulation
-N = SaS(alpha)                  # v.a. du bruit
+N = SaS(alpha, rng)             # v.a. du bruit
 
 tic = time.time()
 for gamma in gammas:
+  # Table des LLR
+  T = llrtable.sas(lambda y: N.logpdf((y - 1.0) / gamma)
+                   - N.logpdf((y + 1.0) / gamma), 1, gamma)
 
   ncw = 0                       # Nombre de mots transmis
   nbe = 0                       # Nombre d'erreurs bit
   nwe = 0                       # Nombre d'erreurs mot
   its = 0                       # Nombre d'itérations
+  prof.reset()
   
   while nbe < minberrors or nwe < minwerrors:
     # Émission du mot de code tout à zero (+1 en BPSK)
     ncw += 1
-    np.copyto(rw, cw)
-    rw = cw + gamma * N.samples(size=cw.shape)
+    N.samples(gamma, out=rw)
+    rw += cw
+    prof.lap('noise')
 
     # Calcul du LLR avant décodage
-    illr = N.logpdf((rw - 1.0) / gamma) - N.logpdf((rw + 1.0) / gamma)
-    
+    T(rw, out=illr)
+    prof.lap('llr')
+
     # Décodage
     it = code.bp(illr, ollr, bpitmax)
     its += it
+    prof.lap('bp')
+    prof.count(it, code.updates)
 
     # Comptage des erreurs
-    err = np.sum(ollr <= 0.0)
+    err = code.errors(ollr)
     nbe += err
     if err > 0: nwe += 1
+    prof.lap('count')
 
     # Affichage
     if 0 == ncw % ppevery:
@@ -94,6 +107,7 @@ for gamma in gammas:
         f'{its/ncw: 7.2f}  {ncw:<20d} '
         f'{nbe/ncw/code.length:<9.2e} {nbe:<10d} '
         f'{nwe/ncw:<9.2e} {nwe:<10d}')
+  prof.report()
 
 tac = time.time()
 print(f"Time: {tac - tic}")
@@ -4,6 +4,8 @@
 
 import numpy as np
 import ldpc
+import channel
+import profiler
 import time
 
 
@@ -13,6 +15,7 @@ ebnos = np.linspace(1, 5, 9)    # Le rapport signal à bruit
 minberrors = 1000               # min erreurs bit à observer
 minwerrors = 100                # min erreurs mot à observer
 bpitmax = 100                   # max itérations
+profile = False                 # Profilage par phase
 
 codefile = '../data/MacKay96-963.ldpc' # Fichier LDPC
 ppevery = 1000       # Affichage temporaire tout les 10 mots
@@ -31,6 +34,7 @@ illr = np.zeros_like(cw)        # LLR de l'entrée
 ollr = np.zeros_like(cw)        # Mot décodé
 
 rng = np.random.default_rng()   # Générateur aléatoire
+prof = profiler.Profiler() if profile else profiler.NoProfiler()
 
 
 ## * Affichage des paramètres
@@ -59,24 +63,29 @@ for ebno in ebnos:
   nbe = 0                       # Nombre d'erreurs bit
   nwe = 0                       # Nombre d'erreurs mot
   its = 0                       # Nombre d'itérations
+  prof.reset()
   
   while nbe < minberrors or nwe < minwerrors:
     # Émission du mot de code tout à zero (+1 en BPSK)
     ncw += 1
-    np.copyto(rw, cw)
-    rw = cw + rng.normal(scale=sigma, size=cw.shape)
+    channel.awgn(cw, sigma, rng, out=rw)
+    prof.lap('noise')
 
     # Calcul du LLR avant décodage
-    illr = 2.0 * rw / sigma2
-    
+    np.multiply(rw, 2.0 / sigma2, out=illr)
+    prof.lap('llr')
+
     # Décodage
     it = code.bp(illr, ollr, bpitmax)
     its += it
+    prof.lap('bp')
+    prof.count(it, code.updates)
 
     # Comptage des erreurs
-    err = np.sum(ollr <= 0.0)
+    err = code.errors(ollr)
     nbe += err
     if err > 0: nwe += 1
+    prof.lap('count')
 
     # Affichage
     if 0 == ncw % ppevery:
@@ -92,6 +101,7 @@ for ebno in ebnos:
         f'{its/ncw: 7.2f}  {ncw:<20d} '
         f'{nbe/ncw/code.length:<9.2e} {nbe:<10d} '
         f'{nwe/ncw:<9.2e} {nwe:<10d}')
+  prof.report()
 
 tac = time.time()
 print(f"Time: {tac - tic}")
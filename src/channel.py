@@ -0,0 +1,44 @@
+## Modulations et canal gaussien écrivant dans des tableaux
+## préalloués. Les tirages aléatoires remplissent directement
+## les tableaux du simulateur : la boucle de simulation
+## n'alloue plus rien d'une trame à l'autre.
+import numpy as np
+
+
+def awgn(x, sigma, rng, out):
+  """Écrit dans `out` le signal `x` reçu à travers un canal
+  gaussien d'écart type `sigma`. `x` ne doit pas être
+  `out`."""
+  rng.standard_normal(out=out)
+  out *= sigma
+  out += x
+  return out
+
+
+class ASK:
+  def __init__(self, labels, size, rng=None):
+    """Modulation ASK dont les niveaux -(M-1), ..., -1, +1,
+    ..., M-1 portent les étiquettes binaires `labels` (par
+    exemple ['11', '10', '00', '01'] pour la 4ASK), pour des
+    mots de `size` symboles."""
+    m = len(labels)
+    self.levels = np.arange(1 - m, m, 2, dtype=np.float64)
+    self.bits = np.array([[l[j] == '1' for l in labels]
+                          for j in range(len(labels[0]))])
+    self.rng = rng or np.random.default_rng()
+    self._u = np.empty(size)                 # Tirage uniforme
+    self._k = np.empty(size, dtype=np.intp)  # Indice des symboles
+
+
+  def __call__(self, out, bits):
+    """Tire des symboles équiprobables dans `out` et écrit
+    leurs étiquettes dans `bits` : les bits 0 de tous les
+    symboles, puis les bits 1, etc."""
+    self.rng.random(out=self._u)
+    self._u *= self.levels.size
+    np.copyto(self._k, self._u, casting='unsafe')
+    np.take(self.levels, self._k, out=out, mode='clip')
+    n = self._k.size
+    for j, b in enumerate(self.bits):
+      np.take(b, self._k, out=bits[j*n:(j+1)*n], mode='clip')
+    return out
@@ -1,72 +1,509 @@
 ## Bibliothèque pour le décodage des codes LDPC.
-import re
+import itertools
+import os
+import tempfile
 import numpy as np
-from numba import jit
+from numba import jit, prange, get_num_threads, int32, int64, float64
 
-p = re.compile('\d+|;|\.')
+try:                            # Module compilé à l'avance (aot.py)
+  import ldpc_aot
+except ImportError:
+  ldpc_aot = None
 
+_GRAPH_MAGIC = int.from_bytes(b'LDPCGRPH', 'little') # En-tête .graph
 
-def _tokens(f):
-  """Lit le fichier `f` caractère par caractère pour en
-  extraire les nombres entiers positifs, les ';' et qui
-  s'arrête au premier '.' pour satisfaire le format des
-  fichiers décrivant les LDPC.""" 
-  num = None
-  c = f.read(1)
-  while c:
-    if c.isdigit():
-      num = int(c) + (10 * num if num else 0)
-    elif num is not None:
-        yield num
-        num = None
-    if c == ';': yield c
-    if c == '.': break
-    c = f.read(1)
+
+## * Formats des fichiers de codes
+##
+## - `.ldpc` (ou toute autre extension) : le format texte du
+##   projet, une parité par séquence terminée par ';', la
+##   dernière par '.'.
+## - `.alist` : le format alist de MacKay, avec ou sans
+##   remplissage par des zéros.
+## - `.graph` : le format binaire du projet, un en-tête de
+##   cinq int64 (magique, taille des index, longueur, nombre
+##   de parités, nombre d'arêtes) suivi de `cedges` et
+##   `vedges` tels qu'en mémoire. Il est projeté en mémoire
+##   par np.memmap, sans analyse.
+##
+## Chaque lecteur retourne `(vedges, cedges, length)`.
+
+def _read_text(path):
+  """Lit un code au format texte du projet. Tout caractère
+  autre qu'un chiffre, ';' ou '.' sépare les nombres et la
+  lecture s'arrête au premier '.'."""
+  buf = np.fromfile(path, dtype=np.uint8)
+  vedges = np.empty(buf.size // 2 + 1, dtype=np.int64)
+  cedges = np.zeros(np.count_nonzero(buf == ord(';')) + 2, dtype=np.int64)
+  nedges, nchecks = numba_parse(buf, vedges, cedges)
+  return vedges[:nedges], cedges[:nchecks+1], None
+
+
+def _write_text(path, vedges, cedges):
+  rows = np.split(vedges, cedges[1:-1])
+  with open(path, 'w') as f:
+    f.write(';\n'.join(' '.join(map(str, r)) for r in rows) + '.\n')
+
+
+def _read_alist(path):
+  """Lit un code au format alist : n m, les degrés maximaux,
+  les degrés des variables puis des parités, les parités de
+  chaque variable puis les variables de chaque parité, indexées
+  à partir de 1 et éventuellement complétées par des 0."""
+  buf = np.fromfile(path, dtype=np.uint8)
+  toks = np.empty(buf.size // 2 + 1, dtype=np.int64)
+  ntoks, _ = numba_parse(buf, toks, np.zeros(2, dtype=np.int64))
+  toks = toks[:ntoks]
+  n, m, dvmax, dcmax = map(int, toks[:4])
+  vdeg, cdeg = toks[4:4+n], toks[4+n:4+n+m]
+  body = toks[4+n+m:]
+  if body.size == vdeg.sum() + cdeg.sum():
+    rows = body[vdeg.sum():]
+  elif body.size == n * dvmax + m * dcmax:
+    rows = body[n*dvmax:].reshape(m, dcmax)
+    rows = rows[rows > 0]
+  else:
+    raise ValueError(f'{path}: inconsistent alist file')
+  return rows - 1, np.concatenate(([0], np.cumsum(cdeg))), n
+
+
+def _write_alist(path, vedges, cedges, length):
+  nchecks = cedges.size - 1
+  cdeg = np.diff(cedges)
+  vdeg = np.bincount(vedges, minlength=length)
+  # Listes complétées par des zéros, indexées à partir de 1
+  order = np.argsort(vedges, kind='stable')
+  vstart = np.concatenate(([0], np.cumsum(vdeg)))
+  vlists = np.zeros((length, max(vdeg.max(), 1)), dtype=np.int64)
+  vlists[vedges[order], np.arange(order.size) - vstart[vedges[order]]] = \
+    np.repeat(np.arange(nchecks), cdeg)[order] + 1
+  clists = np.zeros((nchecks, max(cdeg.max(), 1)), dtype=np.int64)
+  clists[np.repeat(np.arange(nchecks), cdeg),
+         np.arange(vedges.size) - np.repeat(cedges[:-1], cdeg)] = vedges + 1
+  with open(path, 'w') as f:
+    f.write(f'{length} {nchecks}\n{vlists.shape[1]} {clists.shape[1]}\n')
+    np.savetxt(f, vdeg[None,:], fmt='%d')
+    np.savetxt(f, cdeg[None,:], fmt='%d')
+    np.savetxt(f, vlists, fmt='%d')
+    np.savetxt(f, clists, fmt='%d')
+
+
+def _read_graph(path):
+  header = np.fromfile(path, dtype=np.int64, count=5)
+  if header.size < 5 or header[0] != _GRAPH_MAGIC:
+    raise ValueError(f'{path}: not a binary LDPC graph')
+  itemsize, length, nchecks, nedges = map(int, header[1:])
+  dtype = np.dtype(f'i{itemsize}')
+  # Le mode 'c' (copie sur écriture) rend des tableaux
+  # modifiables, comme l'attendent les noyaux numba, sans
+  # jamais dupliquer les pages qui ne sont pas écrites.
+  cedges = np.memmap(path, dtype=dtype, mode='c',
+                     offset=header.nbytes, shape=nchecks+1)
+  vedges = np.memmap(path, dtype=dtype, mode='c',
+                     offset=header.nbytes + cedges.nbytes, shape=nedges)
+  return np.asarray(vedges), np.asarray(cedges), length
+
+
+def _write_graph(path, vedges, cedges, length):
+  header = np.array([_GRAPH_MAGIC, vedges.itemsize, length,
+                     cedges.size-1, vedges.size], dtype=np.int64)
+  with open(path, 'wb') as f:
+    header.tofile(f)
+    cedges.tofile(f)
+    vedges.tofile(f)
+
+
+_READERS = {'.alist': _read_alist, '.graph': _read_graph}
+_WRITERS = {'.alist': _write_alist, '.graph': _write_graph}
 
 
 
 class LDPC:
   def __init__(self, codefile):
     """Lit le fichier nommé `codefile` pour construire le code
-    LDPC qui y est décrit."""
-    checks = [[]]
-    with open(codefile) as f:
-      for tok in _tokens(f):
-        if tok == ';':
-          checks.append([])
-        else:
-          checks[-1].append(tok)
-          
-    self._vedges = np.concatenate(checks)
-    self._cedges = np.cumsum([0] + list(map(len, checks)))
-          
-    self.nedges = self._vedges.size
+    LDPC qui y est décrit, dans le format donné par son
+    extension : `.alist`, `.graph` ou sinon le format texte
+    du projet."""
+    ext = os.path.splitext(codefile)[1]
+    self._setup(*_READERS.get(ext, _read_text)(codefile))
+
+
+  @classmethod
+  def from_edges(cls, vedges, cedges, length=None):
+    """Construit le code LDPC dont la parité `c` porte sur les
+    variables `vedges[cedges[c]:cedges[c+1]]`. Les tableaux
+    ne sont pas copiés s'ils sont déjà contigus et du type
+    d'index retenu."""
+    code = cls.__new__(cls)
+    code._setup(vedges, cedges, length)
+    return code
+
+
+  @classmethod
+  def from_csr(cls, H):
+    """Construit le code LDPC de matrice de parité `H`, une
+    matrice creuse de scipy.sparse dont les coefficients non
+    nuls sont les arêtes."""
+    import scipy.sparse as sp
+    H = sp.csr_matrix(H)
+    if not H.data.all():
+      H = H.copy()
+      H.eliminate_zeros()
+    return cls.from_edges(H.indices, H.indptr, H.shape[1])
+
+
+  def to_csr(self):
+    """Retourne la matrice de parité au format scipy.sparse
+    CSR."""
+    import scipy.sparse as sp
+    return sp.csr_matrix((np.ones(self.nedges, dtype=np.uint8),
+                          self._vedges, self._cedges),
+                         shape=(self.nchecks, self.length))
+
+
+  def save(self, path):
+    """Écrit le code dans le fichier `path` au format donné par
+    son extension, comme pour la lecture."""
+    ext = os.path.splitext(path)[1]
+    if ext in _WRITERS:
+      _WRITERS[ext](path, self._vedges, self._cedges, self.length)
+    else:
+      _write_text(path, self._vedges, self._cedges)
+
+
+  @classmethod
+  def attach(cls, path):
+    """Ouvre le graphe publié par `share` dans le fichier
+    `path` en le projetant en mémoire, sans lecture ni copie.
+    Tous les processus qui l'ouvrent partagent les mêmes pages
+    physiques."""
+    return cls.from_edges(*_read_graph(path))
+
+
+  def share(self, path=None):
+    """Publie le graphe de Tanner au format `.graph` dans le
+    fichier `path`, par défaut un fichier temporaire de
+    /dev/shm, c.-à-d. en mémoire partagée, et retourne son nom
+    à passer à `LDPC.attach` dans les autres processus. Le
+    code utilise ensuite lui-même cette projection. Le fichier
+    est à supprimer par l'appelant une fois les processus
+    terminés."""
+    if path is None:
+      shm = '/dev/shm' if os.path.isdir('/dev/shm') else None
+      fd, path = tempfile.mkstemp(prefix='ldpc-', suffix='.graph', dir=shm)
+      os.close(fd)
+    _write_graph(path, self._vedges, self._cedges, self.length)
+    shared = LDPC.attach(path)
+    self._vedges, self._cedges = shared._vedges, shared._cedges
+    return path
+
+
+  def _setup(self, vedges, cedges, length=None):
+    """Installe le graphe de Tanner et les tableaux de travail.
+    Les index sont stockés en int32 dès que la taille du code
+    le permet."""
+    nedges = vedges.size
+    if length is None: length = 1 + int(vedges.max())
+    index = np.int32 if max(nedges, length) < 2**31 else np.int64
+    self._vedges = np.ascontiguousarray(vedges, dtype=index)
+    self._cedges = np.ascontiguousarray(cedges, dtype=index)
+
+    self.nedges = nedges
     self.nchecks = self._cedges.size-1
-    self.length = 1 + self._vedges.max()
+    self.length = length
     self.rate = (self.length - self.nchecks) / self.length
 
     self._v2c = np.zeros(self.nedges) # Messages var -> chk
     self._c2v = np.zeros(self.nedges) # Messages chk -> var
+    self._words = np.zeros(_nwords(self.length), dtype=np.uint64)
+
+    self._check, self._bp = _kernels(self._vedges.dtype)
 
     
   def check(self, illr):
     """Vérifie si le tableau `illr` contient le LLR d'un mot de
     code."""
-    return numba_check(self._vedges, self._cedges, illr)
+    return self._check(self._vedges, self._cedges, illr)
 
   
-  def bp(self, illr, ollr, maxiter):
+  def hard(self, llr, words=None):
+    """Retourne les décisions dures de `llr` regroupées dans des
+    mots de 64 bits (uint64) : le bit `v` vaut 1 si
+    `llr[v] <= 0`. Les mots sont écrits dans `words` s'il est
+    fourni."""
+    if words is None: words = np.zeros(_nwords(self.length), dtype=np.uint64)
+    numba_pack(llr, words)
+    return words
+
+
+  def syndrome(self, words, synd=None):
+    """Retourne le syndrome, regroupé en mots de 64 bits, des
+    décisions dures `words` (voir `hard`) et l'écrit dans
+    `synd` s'il est fourni."""
+    if synd is None: synd = np.zeros(_nwords(self.nchecks), dtype=np.uint64)
+    numba_syndrome(self._vedges, self._cedges, words, synd)
+    return synd
+
+
+  def errors(self, llr, ref=None):
+    """Retourne le nombre de bits en erreur dans `llr` par
+    rapport au mot tout à zéro, ou aux décisions dures `ref`
+    (voir `hard`) si elles sont données."""
+    if ref is None: return numba_errors(llr, self._words)
+    numba_pack(llr, self._words)
+    return numba_distance(self._words, ref)
+
+
+  def bp(self, illr, ollr, maxiter, method='tanh', schedule='flooding'):
     """Infère le mot de code selon l'algorithme du BP et
     retourne dans `ollr` les LLR de fin de décodage et le
-    nombre d'itérations nécessaire.
+    nombre d'itérations nécessaire. Les parités sont calculées
+    par `method` : 'tanh' avec tanh et arctanh, ou 'table' dans
+    le domaine des LLR par la table de `tabulate`.
+
+    L'ordonnancement `schedule` est soit 'flooding', tous les
+    messages à chaque itération, soit 'residual' (RBP), un
+    message à la fois, celui qui change le plus. Ce dernier
+    n'existe qu'avec 'tanh' ; ses itérations sont comptées par
+    paquets de `nedges` messages et `maxiter` borne donc le
+    nombre de messages à `maxiter * nedges`.
+
+    Le nombre de messages parité -> variable calculés est rangé
+    dans `self.updates`. Par inondation, c'est `nedges` par
+    passe : une itération de moins que le nombre rendu si le
+    mot est décodé, aucune s'il l'était dès l'entrée.
+    """
+    if method not in ('tanh', 'table'):
+      raise ValueError(f'unknown BP method {method!r}')
+    if schedule not in ('flooding', 'residual'):
+      raise ValueError(f'unknown BP schedule {schedule!r}')
+    if schedule == 'residual':
+      if method != 'tanh':
+        raise ValueError(f'residual BP needs method \'tanh\', not {method!r}')
+      self._residual_setup()
+      it, self.updates = numba_rbp(self._vedges, self._cedges, self._vstart,
+                                   self._vlist, self._echk, self._v2c,
+                                   self._c2v, self._cand, self._key,
+                                   self._heap, self._pos, self._prod,
+                                   self._hard, self._cpar, illr, ollr,
+                                   maxiter)
+      return it
+    if method == 'tanh':
+      it, passes = self._bp(self._vedges, self._cedges, self._v2c, self._c2v,
+                            illr, ollr, maxiter)
+    else:
+      if not hasattr(self, '_lut'): self.tabulate()
+      it, passes = numba_bp_table(self._vedges, self._cedges, self._v2c,
+                                  self._c2v, illr, ollr, maxiter, self._lut,
+                                  1.0 / self._lutstep, self._fwd, self._bwd)
+    self.updates = passes * self.nedges
+    return it
+
+
+  def _residual_setup(self):
+    """Alloue au premier appel les tableaux du BP résiduel :
+    arêtes de chaque variable, parité de chaque arête, messages
+    candidats, tas indexé des résidus, produits partiels d'une
+    parité et syndrome courant."""
+    if hasattr(self, '_vlist'): return
+    self._vlist = np.argsort(self._vedges, kind='stable')
+    vdeg = np.bincount(self._vedges, minlength=self.length)
+    self._vstart = np.concatenate(([0], np.cumsum(vdeg)))
+    self._echk = np.repeat(np.arange(self.nchecks), np.diff(self._cedges))
+    self._cand = np.zeros(self.nedges)
+    self._key = np.zeros(self.nedges)
+    self._heap = np.zeros(self.nedges, dtype=np.int64)
+    self._pos = np.zeros(self.nedges, dtype=np.int64)
+    self._prod = np.zeros(np.diff(self._cedges).max())
+    self._hard = np.zeros(self.length, dtype=np.uint8)
+    self._cpar = np.zeros(self.nchecks, dtype=np.uint8)
+
+
+  def tabulate(self, tol=1e-4):
+    """Construit la table de la correction log(1 + exp(-x)) de
+    l'opération ⊞ utilisée par `bp(..., method='table')`. Le
+    pas est choisi pour que l'erreur d'interpolation sur chaque
+    ⊞ reste sous `tol`."""
+    self._lut, self._lutstep = boxplus_table(tol)
+    dcmax = max(1, int(np.diff(self._cedges).max(initial=0)))
+    self._fwd = np.zeros(dcmax)
+    self._bwd = np.zeros(dcmax)
+
+
+  def gallager(self, illr, ollr, maxiter):
+    """Infère le mot de code selon l'algorithme B de Gallager,
+    à messages binaires, et retourne dans `ollr` les décisions
+    dures (+1 ou -1) et le nombre d'itérations nécessaire."""
+    self._bitflip_setup()
+    return numba_gallager(self._vedges, self._cedges, self._vdeg,
+                          self._bv2c, self._bc2v, self._count,
+                          illr, ollr, self._words, self._synd, maxiter)
+
+
+  def gdbf(self, illr, ollr, maxiter, theta=-0.6):
+    """Infère le mot de code par inversion de bits selon la
+    descente de gradient (GDBF de Wadayama et al.) pondérée par
+    `illr` : à chaque itération sont inversés les bits dont la
+    fonction d'inversion est sous `theta`, ou à défaut celui
+    qui la minimise. Retourne dans `ollr` les décisions dures
+    (+1 ou -1) et le nombre d'itérations nécessaire."""
+    self._bitflip_setup()
+    return numba_gdbf(self._vedges, self._cedges, self._delta,
+                      illr, ollr, self._words, self._synd, theta, maxiter)
+
+
+  def bfbp(self, illr, ollr, maxiter, bfiter=20, maxcost=1.0):
+    """Décode d'abord par inversion de bits (`gdbf`) pendant au
+    plus `bfiter` itérations et ne passe au BP que si le mot
+    n'est pas décodé ou peu fiable. Le mot de `gdbf` est jugé
+    fiable si la somme des |`illr`| des bits inversés par
+    rapport au canal ne dépasse pas `maxcost` fois leur
+    moyenne : au-delà, `gdbf` aboutit souvent à un autre mot
+    de code que celui émis, là où le BP aurait décodé.
+    Retourne dans `ollr` les décisions dures ou les LLR du BP
+    et le nombre total d'itérations."""
+    it = self.gdbf(illr, ollr, bfiter)
+    if ((it < bfiter or self.check(ollr))
+        and numba_flipcost(illr, ollr) <= maxcost): return it
+    return it + self.bp(illr, ollr, maxiter)
+
+
+  def _bitflip_setup(self):
+    """Alloue au premier appel les tableaux de travail des
+    décodeurs à inversion de bits."""
+    if hasattr(self, '_vdeg'): return
+    self._vdeg = np.bincount(self._vedges, minlength=self.length)
+    self._bv2c = np.zeros(self.nedges, dtype=np.uint8)
+    self._bc2v = np.zeros(self.nedges, dtype=np.uint8)
+    self._count = np.zeros(self.length, dtype=np.int64)
+    self._delta = np.zeros(self.length)
+    self._synd = np.zeros(_nwords(self.nchecks), dtype=np.uint64)
+
+
+  def bp_slots(self, frames, maxiter, nslots=None, batch=64,
+               memory=64 << 20):
+    """Décode selon l'algorithme du BP les trames de LLR de
+    l'itérable `frames` sur `nslots` emplacements décodés en
+    parallèle, par défaut un par fil d'exécution de numba. Les
+    trames sont lues par paquets de `batch` trames par
+    emplacement et chaque paquet est décodé en un seul appel :
+    un emplacement dont la trame est décodée, ou arrêtée après
+    `maxiter` itérations, passe aussitôt à sa trame suivante
+    sans repasser par Python. Génère dans l'ordre des trames
+    le nombre d'itérations et les LLR de fin de décodage de
+    chacune. Les paquets sont réduits pour que les tampons de
+    LLR d'entrée et de sortie tiennent dans `memory` octets.
     """
-    return numba_bp(self._vedges, self._cedges, self._v2c, self._c2v,
-                    illr, ollr, maxiter)
+    if nslots is None: nslots = get_num_threads()
+    batch = max(1, min(batch, memory // (16 * self.length * nslots)))
+    size = nslots * batch
+    v2c = np.zeros((nslots, self.nedges))
+    c2v = np.zeros((nslots, self.nedges))
+    illr = np.zeros((size, self.length))
+    ollr = np.zeros((size, self.length))
+    its = np.zeros(size, dtype=np.int64)
+
+    frames = iter(frames)
+    while True:
+      n = 0
+      for frame in itertools.islice(frames, size):
+        np.copyto(illr[n], frame)
+        n += 1
+      if n == 0: return
+      numba_bp_slots(self._vedges, self._cedges, v2c, c2v, illr, ollr,
+                     its, n, maxiter)
+      for q in range(n): yield int(its[q]), ollr[q].copy()
+      if n < size: return
+
+
+
+
+def boxplus_table(tol):
+  """Retourne la table de f(x) = log(1 + exp(-x)) et son pas,
+  de sorte que a ⊞ b = sgn(a) sgn(b) min(|a|, |b|)
+  + f(|a + b|) - f(|a - b|) soit calculé à `tol` près par
+  interpolation linéaire. Comme |f''| <= 1/4, l'erreur sur
+  chaque f est au plus pas²/32 ; la table s'arrête là où f
+  est sous `tol` et vaut 0 au-delà."""
+  step = np.sqrt(16.0 * tol)
+  xmax = -np.log(np.expm1(tol))
+  x = np.arange(int(np.ceil(xmax / step)) + 1) * step
+  lut = np.log1p(np.exp(-x))
+  lut[-1] = 0.0
+  return lut, step
+
+
+
+def _nwords(nbits):
+  """Nombre de mots de 64 bits pour `nbits` bits."""
+  return (nbits + 63) // 64
+
+
+
+def _kernels(dtype):
+  """Retourne les noyaux `check` et `bp` pour des index de type
+  `dtype`, pris dans le module `ldpc_aot` s'il a été compilé
+  et sinon les fonctions numba."""
+  if ldpc_aot is None: return numba_check, numba_bp
+  suffix = {np.dtype(np.int64): 'i8', np.dtype(np.int32): 'i4'}[dtype]
+  check = getattr(ldpc_aot, f'check_{suffix}')
+  bp = getattr(ldpc_aot, f'bp_{suffix}')
+
+  # Les noyaux compilés à l'avance ne vérifient pas le type de
+  # leurs arguments : les autres tableaux passent par numba.
+  def aot_check(vedges, cedges, illr):
+    if _native(illr): return check(vedges, cedges, illr)
+    return numba_check(vedges, cedges, illr)
+
+  def aot_bp(vedges, cedges, v2c, c2v, illr, ollr, maxiter):
+    if _native(illr) and _native(ollr) and ollr.flags.writeable:
+      return bp(vedges, cedges, v2c, c2v, illr, ollr, maxiter)
+    return numba_bp(vedges, cedges, v2c, c2v, illr, ollr, maxiter)
+
+  return aot_check, aot_bp
+
+
+
+def _native(x):
+  """Vrai si `x` est un tableau float64 contigu, seul type de
+  LLR accepté par les noyaux de `ldpc_aot`."""
+  return (isinstance(x, np.ndarray) and x.dtype == np.float64
+          and x.flags.c_contiguous)
+
+
 
+@jit(nopython=True, cache=True)
+def numba_parse(buf, vedges, cedges):
+  """Extrait des octets `buf` les entiers positifs dans
+  `vedges` et les positions des ';' dans `cedges`, jusqu'au
+  premier '.'. Retourne le nombre d'entiers et de séquences."""
+  nedges = 0
+  nchecks = 0
+  num = -1
+  for i in range(buf.size):
+    c = buf[i]
+    if 48 <= c <= 57:           # '0'...'9'
+      num = (c - 48) + (10 * num if num > 0 else 0)
+    else:
+      if num >= 0:
+        vedges[nedges] = num
+        nedges += 1
+        num = -1
+      if c == 59:               # ';'
+        nchecks += 1
+        cedges[nchecks] = nedges
+      elif c == 46:             # '.'
+        break
+  if num >= 0:
+    vedges[nedges] = num
+    nedges += 1
+  nchecks += 1
+  cedges[nchecks] = nedges
+  return nedges, nchecks
 
 
 
-@jit(nopython=True, fastmath=True)
+@jit(nopython=True, nogil=True, fastmath=True, cache=True)
 def numba_check(vedges, cedges, illr):
   iscodeword = True
   for c in range(cedges.shape[0]-1):
@@ -78,7 +515,395 @@ def numba_check(vedges, cedges, illr):
 
   
 
-@jit(nopython=True, fastmath=True)
+## Décisions dures regroupées par mots de 64 bits : le bit
+## v % 64 du mot v // 64 vaut 1 si le LLR de v est <= 0.
+
+_ONE = np.uint64(1)
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0f0f0f0f0f0f0f0f)
+_H01 = np.uint64(0x0101010101010101)
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def numba_popcount(x):
+  x = x - ((x >> _ONE) & _M1)
+  x = (x & _M2) + ((x >> np.uint64(2)) & _M2)
+  x = (x + (x >> np.uint64(4))) & _M4
+  return (x * _H01) >> np.uint64(56)
+
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def numba_pack(llr, words):
+  for w in range(words.size):
+    acc = np.uint64(0)
+    for b in range(min(64, llr.size - 64*w)):
+      if llr[64*w + b] <= 0.0:
+        acc |= _ONE << np.uint64(b)
+    words[w] = acc
+
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def numba_errors(llr, words):
+  numba_pack(llr, words)
+  n = 0
+  for w in range(words.size):
+    n += numba_popcount(words[w])
+  return n
+
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def numba_distance(words, ref):
+  n = 0
+  for w in range(words.size):
+    n += numba_popcount(words[w] ^ ref[w])
+  return n
+
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def numba_syndrome(vedges, cedges, words, synd):
+  synd[:] = 0
+  n = 0
+  for c in range(cedges.size-1):
+    p = np.uint64(0)
+    for e in range(cedges[c], cedges[c+1]):
+      v = vedges[e]
+      p ^= words[v >> 6] >> np.uint64(v & 63)
+    if p & _ONE:
+      synd[c >> 6] |= _ONE << np.uint64(c & 63)
+      n += 1
+  return n
+
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def numba_gallager(vedges, cedges, vdeg, v2c, c2v, count,
+                   illr, ollr, words, synd, maxiter):
+  # Initialisation : messages et décisions du canal
+  for v in range(illr.size): ollr[v] = 1.0 if illr[v] > 0.0 else -1.0
+  for e in range(vedges.size): v2c[e] = illr[vedges[e]] <= 0.0
+
+  for it in range(maxiter):
+    # Arrêt prématuré
+    numba_pack(ollr, words)
+    if numba_syndrome(vedges, cedges, words, synd) == 0:
+      return 1+it
+
+    # Check pass : parité des autres messages
+    for c in range(cedges.size-1):
+      p = 0
+      for e in range(cedges[c], cedges[c+1]): p ^= v2c[e]
+      for e in range(cedges[c], cedges[c+1]): c2v[e] = p ^ v2c[e]
+
+    # Data pass : le bit du canal est inversé vers une parité si
+    # une majorité stricte des autres parités le contredit
+    count[:] = 0
+    for e in range(vedges.size):
+      v = vedges[e]
+      count[v] += c2v[e] != (illr[v] <= 0.0)
+    for e in range(vedges.size):
+      v = vedges[e]
+      ch = illr[v] <= 0.0
+      others = count[v] - (c2v[e] != ch)
+      v2c[e] = ch ^ (2 * others > vdeg[v] - 1)
+    for v in range(illr.size):
+      if 2 * count[v] > vdeg[v] + 1:
+        ollr[v] = -1.0 if illr[v] > 0.0 else 1.0
+      else:
+        ollr[v] = 1.0 if illr[v] > 0.0 else -1.0
+
+  return maxiter
+
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def numba_gdbf(vedges, cedges, delta, illr, ollr, words, synd, theta, maxiter):
+  # Initialisation : décisions du canal et normalisation des
+  # LLR à une amplitude moyenne de 1, celle d'un signal BPSK
+  scale = 0.0
+  for v in range(illr.size):
+    ollr[v] = 1.0 if illr[v] > 0.0 else -1.0
+    scale += abs(illr[v])
+  scale = illr.size / scale if scale > 0.0 else 1.0
+
+  for it in range(maxiter):
+    # Arrêt prématuré
+    numba_pack(ollr, words)
+    if numba_syndrome(vedges, cedges, words, synd) == 0:
+      return 1+it
+
+    # Fonction d'inversion : corrélation avec le canal plus
+    # somme des parités bipolaires
+    for v in range(illr.size): delta[v] = scale * ollr[v] * illr[v]
+    for c in range(cedges.size-1):
+      s = -1.0 if (synd[c >> 6] >> np.uint64(c & 63)) & _ONE else 1.0
+      for e in range(cedges[c], cedges[c+1]):
+        delta[vedges[e]] += s
+
+    # Inversions
+    vmin = 0
+    nflips = 0
+    for v in range(illr.size):
+      if delta[v] < delta[vmin]: vmin = v
+      if delta[v] < theta:
+        ollr[v] = -ollr[v]
+        nflips += 1
+    if nflips == 0: ollr[vmin] = -ollr[vmin]
+
+  return maxiter
+
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def numba_flipcost(illr, ollr):
+  # Somme des |illr| des bits dont la décision dure diffère
+  # entre illr et ollr, rapportée à la moyenne des |illr|
+  cost = 0.0
+  total = 0.0
+  for v in range(illr.size):
+    a = abs(illr[v])
+    total += a
+    if (illr[v] <= 0.0) != (ollr[v] <= 0.0): cost += a
+  if total == 0.0: return 0.0
+  return cost * illr.size / total
+
+
+
+## BP dans le domaine des LLR par l'opération ⊞ tabulée. Les
+## LLR sont bornés par _LLRMAX pour que tous les calculs
+## restent finis, ce que suppose fastmath.
+
+_LLRMAX = 1e3
+
+
+@jit(nopython=True, nogil=True, fastmath=True, cache=True)
+def numba_clip(x):
+  return min(max(x, -_LLRMAX), _LLRMAX)
+
+
+
+@jit(nopython=True, nogil=True, fastmath=True, cache=True)
+def numba_boxplus(a, b, lut, invstep):
+  m = min(abs(a), abs(b))
+  if (a < 0.0) != (b < 0.0): m = -m
+  t = abs(a + b) * invstep
+  if t < lut.size - 1:
+    i = int(t)
+    m += lut[i] + (t - i) * (lut[i+1] - lut[i])
+  t = abs(a - b) * invstep
+  if t < lut.size - 1:
+    i = int(t)
+    m -= lut[i] + (t - i) * (lut[i+1] - lut[i])
+  return m
+
+
+
+@jit(nopython=True, nogil=True, fastmath=True, cache=True)
+def numba_bp_table(vedges, cedges, v2c, c2v, illr, ollr, maxiter,
+                   lut, invstep, fwd, bwd):
+  # Initialisation
+  for v in range(illr.size): ollr[v] = numba_clip(illr[v])
+  for e in range(v2c.size): v2c[e] = ollr[vedges[e]]
+
+  for it in range(maxiter):
+    # Arrêt prématuré
+    if numba_check(vedges, cedges, ollr):
+      return 1+it, it
+
+    # Check pass : ⊞ des autres messages par passes avant et
+    # arrière
+    for c in range(cedges.size-1):
+      e0 = cedges[c]
+      d = cedges[c+1] - e0
+      if d == 1: c2v[e0] = _LLRMAX
+      if d < 2: continue
+      fwd[0] = v2c[e0]
+      for k in range(1, d):
+        fwd[k] = numba_boxplus(fwd[k-1], v2c[e0+k], lut, invstep)
+      bwd[d-1] = v2c[e0+d-1]
+      for k in range(d-2, -1, -1):
+        bwd[k] = numba_boxplus(v2c[e0+k], bwd[k+1], lut, invstep)
+      c2v[e0] = bwd[1]
+      c2v[e0+d-1] = fwd[d-2]
+      for k in range(1, d-1):
+        c2v[e0+k] = numba_boxplus(fwd[k-1], bwd[k+1], lut, invstep)
+
+    # Data pass
+    for v in range(illr.size): ollr[v] = numba_clip(illr[v])
+    for e in range(vedges.shape[0]):
+      ollr[vedges[e]] += c2v[e]
+    for e in range(vedges.shape[0]):
+      v2c[e] = numba_clip(ollr[vedges[e]] - c2v[e])
+
+  return maxiter, maxiter
+
+
+
+## BP résiduel : les messages parité -> variable sont mis à
+## jour un par un, par ordre décroissant de leur résidu
+## |nouveau - ancien| tenu dans un tas binaire indexé (`heap`
+## contient les arêtes, `pos` la place de chaque arête dans le
+## tas et `key` son résidu).
+
+@jit(nopython=True, nogil=True, cache=True)
+def numba_sift_up(heap, pos, key, i):
+  e = heap[i]
+  while i > 0:
+    p = (i - 1) // 2
+    if key[heap[p]] >= key[e]: break
+    heap[i] = heap[p]
+    pos[heap[i]] = i
+    i = p
+  heap[i] = e
+  pos[e] = i
+
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def numba_sift_down(heap, pos, key, i):
+  e = heap[i]
+  while True:
+    c = 2 * i + 1
+    if c >= heap.size: break
+    if c + 1 < heap.size and key[heap[c+1]] > key[heap[c]]: c += 1
+    if key[heap[c]] <= key[e]: break
+    heap[i] = heap[c]
+    pos[heap[i]] = i
+    i = c
+  heap[i] = e
+  pos[e] = i
+
+
+
+@jit(nopython=True, nogil=True, fastmath=True, cache=True)
+def numba_rbp_check(cedges, v2c, c2v, cand, key, heap, pos, prod, c, skip,
+                    sift):
+  # Messages candidats de la parité c, sauf vers l'arête skip :
+  # produits avant dans prod puis produits arrière à la volée
+  e0 = cedges[c]
+  d = cedges[c+1] - e0
+  prod[0] = 1.0
+  for k in range(1, d): prod[k] = prod[k-1] * v2c[e0+k-1]
+  b = 1.0
+  for k in range(d-1, -1, -1):
+    m = prod[k] * b
+    b *= v2c[e0+k]
+    if e0 + k == skip: continue
+    if m >= 1.0: cand[e0+k] = 1e300
+    elif m <= -1.0: cand[e0+k] = -1e300
+    else: cand[e0+k] = 2.0 * np.arctanh(m)
+
+  for e in range(e0, e0 + d):
+    if e == skip: continue
+    r = abs(cand[e] - c2v[e])
+    if sift:
+      old = key[e]
+      key[e] = r
+      if r > old: numba_sift_up(heap, pos, key, pos[e])
+      else: numba_sift_down(heap, pos, key, pos[e])
+    else:
+      key[e] = r
+
+
+
+@jit(nopython=True, nogil=True, fastmath=True, cache=True)
+def numba_rbp(vedges, cedges, vstart, vlist, echk, v2c, c2v, cand, key,
+              heap, pos, prod, hard, cpar, illr, ollr, maxiter):
+  nedges = vedges.size
+
+  # Initialisation des messages et du syndrome
+  for v in range(illr.size):
+    ollr[v] = illr[v]
+    hard[v] = illr[v] < 0.0
+  unsat = 0
+  for c in range(cedges.size-1):
+    p = 0
+    for e in range(cedges[c], cedges[c+1]): p ^= hard[vedges[e]]
+    cpar[c] = p
+    unsat += p
+  if unsat == 0: return 1, 0
+  for e in range(nedges):
+    v2c[e] = np.tanh(illr[vedges[e]]/2.0)
+    c2v[e] = 0.0
+
+  # Tous les candidats puis construction du tas
+  for c in range(cedges.size-1):
+    numba_rbp_check(cedges, v2c, c2v, cand, key, heap, pos, prod, c, -1,
+                    False)
+  for e in range(nedges): heap[e] = e
+  for i in range(nedges // 2 - 1, -1, -1):
+    numba_sift_down(heap, pos, key, i)
+  for i in range(nedges): pos[heap[i]] = i
+
+  updates = 0
+  while updates < maxiter * nedges:
+    e = heap[0]
+    if key[e] <= 1e-12: break   # Point fixe sans mot de code
+    v = vedges[e]
+    c2v[e] = cand[e]
+    key[e] = 0.0
+    numba_sift_down(heap, pos, key, 0)
+    updates += 1
+
+    # Nouvelle croyance de v et mise à jour du syndrome
+    l = illr[v]
+    for i in range(vstart[v], vstart[v+1]): l += c2v[vlist[i]]
+    ollr[v] = l
+    h = l < 0.0
+    if h != hard[v]:
+      hard[v] = h
+      for i in range(vstart[v], vstart[v+1]):
+        c = echk[vlist[i]]
+        cpar[c] ^= 1
+        unsat += 1 if cpar[c] else -1
+      if unsat == 0: return 1 + updates // nedges, updates
+
+    # Messages de v vers ses autres parités et leurs candidats
+    for i in range(vstart[v], vstart[v+1]):
+      f = vlist[i]
+      if f == e: continue
+      v2c[f] = np.tanh((l - c2v[f])/2.0)
+      numba_rbp_check(cedges, v2c, c2v, cand, key, heap, pos, prod,
+                      echk[f], f, True)
+
+  return maxiter, updates
+
+
+
+@jit(nopython=True, nogil=True, fastmath=True, cache=True)
+def numba_bp_init(vedges, v2c, illr, ollr):
+  for v in range(illr.size): ollr[v] = illr[v]
+  for e in range(v2c.size): v2c[e] = np.tanh(ollr[vedges[e]]/2.0)
+
+
+
+@jit(nopython=True, nogil=True, fastmath=True, cache=True)
+def numba_bp_iterate(vedges, cedges, v2c, c2v, illr, ollr):
+  # Check pass
+  for c in range(cedges.size-1):
+    for e in range(cedges[c], cedges[c+1]):
+      m = 1.0
+      for ep in range(cedges[c], cedges[c+1]):
+        if e != ep:
+          m *= v2c[ep]
+      if m >= 1.0: c2v[e] = 1e300
+      elif m <= -1.0: c2v[e] = -1e300
+      else: c2v[e] = 2.0 * np.arctanh(m)
+
+  # Data pass
+  for v in range(illr.size): ollr[v] = illr[v]
+  for e in range(vedges.shape[0]):
+    ollr[vedges[e]] += c2v[e]
+  for e in range(vedges.shape[0]):
+    v2c[e] = np.tanh((ollr[vedges[e]] - c2v[e])/2.0)
+
+
+
+@jit(nopython=True, nogil=True, fastmath=True, cache=True)
 def numba_bp(vedges,
              cedges,
              v2c,
@@ -87,31 +912,46 @@ def numba_bp(vedges,
              ollr,
              maxiter):  
   # Initialisation
-  for v in range(illr.size): ollr[v] = illr[v]
-  for e in range(v2c.size): v2c[e] = np.tanh(ollr[vedges[e]]/2.0)
+  numba_bp_init(vedges, v2c, illr, ollr)
 
   # # Itération
   for it in range(maxiter):
     # Arrêt prématuré
     if numba_check(vedges, cedges, ollr):
-      return 1+it
+      return 1+it, it
+    numba_bp_iterate(vedges, cedges, v2c, c2v, illr, ollr)
+      
+  return maxiter, maxiter
 
-    # Check pass
-    for c in range(cedges.size-1):
-      for e in range(cedges[c], cedges[c+1]):
-        m = 1.0
-        for ep in range(cedges[c], cedges[c+1]):
-          if e != ep:
-            m *= v2c[ep]
-        if m >= 1.0: c2v[e] = 1e300
-        elif m <= -1.0: c2v[e] = -1e300
-        else: c2v[e] = 2.0 * np.arctanh(m)
 
-    # Data pass
-    for v in range(illr.size): ollr[v] = illr[v]
-    for e in range(vedges.shape[0]):
-      ollr[vedges[e]] += c2v[e]
-    for e in range(vedges.shape[0]):
-      v2c[e] = np.tanh((ollr[vedges[e]] - c2v[e])/2.0)
-      
-  return maxiter
+## `numba_check` et `numba_bp` sont compilés dès l'import pour
+## les index int64 et int32 et mis en cache sur disque
+## (__pycache__) : seul le premier lancement paie la
+## compilation LLVM. Ils restent paresseux pour les autres
+## types d'arguments (LLR en lecture seule, non contigus ou en
+## float32), compilés au premier appel. C'est inutile si le
+## module ldpc_aot est présent.
+
+if ldpc_aot is None:
+  for index in (int64, int32):
+    numba_check.compile((index[::1], index[::1], float64[::1]))
+    numba_bp.compile((index[::1], index[::1], float64[::1], float64[::1],
+                      float64[::1], float64[::1], int64))
+
+
+
+# Compilé au premier appel seulement (puis mis en cache) pour
+# ne pas alourdir le démarrage des processus qui ne s'en
+# servent pas.
+@jit(nopython=True, nogil=True, fastmath=True, cache=True, parallel=True)
+def numba_bp_slots(vedges, cedges, v2c, c2v, illr, ollr, its, nframes, maxiter):
+  # L'emplacement s décode les trames s, s + nslots, s +
+  # 2 nslots, ... des nframes premières : il enchaîne sur la
+  # suivante dès que la trame en cours est terminée, sans
+  # attendre les autres emplacements. Une seule région
+  # parallèle par paquet de trames.
+  nslots = v2c.shape[0]
+  for s in prange(nslots):
+    for q in range(s, nframes, nslots):
+      its[q] = numba_bp(vedges, cedges, v2c[s], c2v[s], illr[q], ollr[q],
+                        maxiter)[0]
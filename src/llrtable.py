@@ -0,0 +1,65 @@
+## Tables des LLR des canaux sans mémoire. Pour un point de
+## fonctionnement fixé (sigma ou gamma), le LLR d'un bit est
+## une fonction fixe de l'échantillon reçu : elle est
+## échantillonnée une fois sur une grille fine puis lue par
+## interpolation linéaire pour chaque échantillon.
+import numpy as np
+from numba import jit
+
+
+class LLRTable:
+  def __init__(self, llr, ymin, ymax, size, extrapolate):
+    """Échantillonne la fonction vectorisée `llr` en `size`
+    points régulièrement espacés de [`ymin`, `ymax`]. Hors de
+    cet intervalle, la table est prolongée linéairement si
+    `extrapolate` et sinon par sa valeur au bord."""
+    self.ymin = ymin
+    self.step = (ymax - ymin) / (size - 1)
+    self.extrapolate = extrapolate
+    self.lut = np.ascontiguousarray(llr(np.linspace(ymin, ymax, size)),
+                                    dtype=np.float64)
+
+
+  def __call__(self, y, out=None):
+    """Retourne les LLR des échantillons `y`, écrits dans `out`
+    s'il est fourni."""
+    if out is None: out = np.empty_like(y, dtype=np.float64)
+    numba_lookup(y, self.lut, self.ymin, 1.0 / self.step,
+                 self.extrapolate, out)
+    return out
+
+
+def awgn(llr, amax, sigma, size=4096):
+  """Table de la fonction `llr` pour un canal gaussien d'écart
+  type `sigma` et une constellation dans [-`amax`, `amax`]. La
+  grille couvre 10 sigma au-delà ; plus loin les LLR gaussiens
+  sont affines et la table est prolongée linéairement."""
+  ymax = amax + 10.0 * sigma
+  return LLRTable(llr, -ymax, ymax, size, True)
+
+
+def sas(llr, amax, gamma, size=65536):
+  """Table de la fonction `llr` pour un canal alpha-stable
+  d'échelle `gamma` et une constellation dans [-`amax`,
+  `amax`]. La grille couvre 1000 gamma au-delà ; plus loin les
+  LLR tendent vers 0 et la table est prolongée par sa valeur au
+  bord."""
+  ymax = amax + 1000.0 * gamma
+  return LLRTable(llr, -ymax, ymax, size, False)
+
+
+
+@jit(nopython=True, nogil=True, fastmath=True, cache=True)
+def numba_lookup(y, lut, ymin, invstep, extrapolate, out):
+  last = lut.size - 1
+  for k in range(y.size):
+    t = (y[k] - ymin) * invstep
+    if t < 0.0:
+      i = 0
+      if not extrapolate: t = 0.0
+    elif t >= last:
+      i = last - 1
+      if not extrapolate: t = last
+    else:
+      i = int(t)
+    out[k] = lut[i] + (t - i) * (lut[i+1] - lut[i])
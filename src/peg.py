@@ -0,0 +1,287 @@
+## Construction de codes LDPC par croissance progressive des
+## arêtes (PEG de Hu, Eleftheriou et Arnold) ou aléatoires
+## réguliers à la MacKay.
+import numpy as np
+from numba import jit
+import ldpc
+
+
+def _degrees(length, vdegrees):
+  """Retourne les degrés des `length` variables, dans l'ordre
+  croissant, pour `vdegrees` un degré unique ou un
+  dictionnaire {degré: fraction des variables}."""
+  if np.isscalar(vdegrees):
+    return np.full(length, int(vdegrees), dtype=np.int64)
+  degrees = sorted(vdegrees)
+  fractions = np.array([vdegrees[d] for d in degrees], dtype=float)
+  counts = np.floor(fractions / fractions.sum() * length).astype(np.int64)
+  counts[np.argmax(fractions)] += length - counts.sum()
+  return np.repeat(np.array(degrees, dtype=np.int64), counts)
+
+
+def _code(length, nchecks, echk, evar):
+  """Construit le code LDPC dont l'arête `e` relie la parité
+  `echk[e]` à la variable `evar[e]`."""
+  order = np.argsort(echk, kind='stable')
+  cedges = np.concatenate(([0], np.cumsum(np.bincount(echk, minlength=nchecks))))
+  return ldpc.LDPC.from_edges(evar[order], cedges, length)
+
+
+def peg(length, rate, vdegrees, maxdepth=-1, seed=None):
+  """Construit par PEG un code LDPC de longueur `length`, de
+  rendement `rate` et dont les variables ont les degrés
+  `vdegrees` (voir `_degrees`). Chaque arête est placée vers
+  une parité la plus lointaine possible de sa variable, ce qui
+  maximise localement la maille. La recherche en largeur est
+  limitée à `maxdepth` niveaux si `maxdepth` >= 0 : son coût
+  ne dépend alors plus de `length` et les parités rangées par
+  degré donnent la candidate en temps presque constant, ce qui
+  rend les très grands codes accessibles."""
+  vdeg = _degrees(length, vdegrees)
+  nchecks = int(round(length * (1 - rate)))
+  if vdeg.max() > nchecks:
+    raise ValueError(f'variable degree {vdeg.max()} exceeds the '
+                     f'{nchecks} checks')
+  if seed is not None: numba_seed(seed)
+  vstart = np.concatenate(([0], np.cumsum(vdeg)))
+  echk = np.empty(vstart[-1], dtype=np.int64)
+  evar = np.repeat(np.arange(length, dtype=np.int64), vdeg)
+  numba_peg(vdeg, vstart, evar, nchecks, maxdepth, echk)
+  return _code(length, nchecks, echk, evar)
+
+
+def mackay(length, rate, vdegree, seed=None):
+  """Construit un code LDPC aléatoire régulier de longueur
+  `length`, de rendement `rate` et dont toutes les variables
+  sont de degré `vdegree`. Les degrés des parités diffèrent au
+  plus de 1 et aucune variable n'est reliée deux fois à la
+  même parité."""
+  nchecks = int(round(length * (1 - rate)))
+  nedges = length * vdegree
+  if seed is not None: numba_seed(seed)
+  cdeg = np.full(nchecks, nedges // nchecks, dtype=np.int64)
+  cdeg[:nedges % nchecks] += 1
+  echk = np.repeat(np.arange(nchecks, dtype=np.int64), cdeg)
+  evar = np.repeat(np.arange(length, dtype=np.int64), vdegree)
+  numba_mackay(echk, vdegree)
+  return _code(length, nchecks, echk, evar)
+
+
+
+@jit(nopython=True, cache=True)
+def numba_seed(seed):
+  np.random.seed(seed)
+
+
+
+@jit(nopython=True, cache=True)
+def numba_argmin(cdeg, candidates, ncandidates):
+  """Retourne une parité de degré minimal parmi les
+  `ncandidates` premières de `candidates`, au hasard en cas
+  d'égalité."""
+  best = -1
+  ties = 0
+  for i in range(ncandidates):
+    c = candidates[i]
+    if best < 0 or cdeg[c] < cdeg[best]:
+      best = c
+      ties = 1
+    elif cdeg[c] == cdeg[best]:
+      ties += 1
+      if np.random.random() * ties < 1.0: best = c
+  return best
+
+
+
+@jit(nopython=True, cache=True)
+def numba_unreached(order, bstart, cmark, stamp, reached, dmin, candidates):
+  """Retourne une parité de degré minimal parmi celles qui ne
+  sont pas marquées de `stamp`, au hasard en cas d'égalité, ou
+  -1 s'il n'y en a pas. Les parités de degré d sont
+  `order[bstart[d]:bstart[d+1]]`, dont `reached[d]` sont
+  marquées."""
+  for d in range(dmin, bstart.size - 1):
+    size = bstart[d+1] - bstart[d]
+    free = size - reached[d]
+    if free == 0: continue
+    if 2 * free >= size:
+      # Tirage avec rejet : moins de deux essais en moyenne
+      while True:
+        c = order[bstart[d] + np.random.randint(size)]
+        if cmark[c] != stamp: return c
+    # Seau surtout marqué : son parcours coûte moins que la
+    # recherche qui l'a marqué
+    ncandidates = 0
+    for i in range(bstart[d], bstart[d+1]):
+      c = order[i]
+      if cmark[c] != stamp:
+        candidates[ncandidates] = c
+        ncandidates += 1
+    return candidates[np.random.randint(ncandidates)]
+  return -1
+
+
+
+@jit(nopython=True, cache=True)
+def numba_peg(vdeg, vstart, evar, nchecks, maxdepth, echk):
+  length = vdeg.size
+  chead = np.full(nchecks, -1, dtype=np.int64) # Listes des arêtes
+  enext = np.full(echk.size, -1, dtype=np.int64) # par parité
+  cdeg = np.zeros(nchecks, dtype=np.int64)
+  cmark = np.zeros(nchecks, dtype=np.int64)    # Marques de la
+  vmark = np.zeros(length, dtype=np.int64)     # recherche
+  queue = np.empty(nchecks, dtype=np.int64)    # File des parités
+  candidates = np.empty(nchecks, dtype=np.int64)
+  stamp = 0
+
+  # Parités rangées par degré croissant : celles de degré d
+  # sont order[bstart[d]:bstart[d+1]] et where[c] est la place
+  # de c dans order. Une parité a au plus `length` arêtes.
+  order = np.arange(nchecks)
+  where = np.arange(nchecks)
+  bstart = np.full(length + 2, nchecks, dtype=np.int64)
+  bstart[0] = 0
+  reached = np.zeros(length + 1, dtype=np.int64) # Marquées par degré
+  dmin = 0                      # Plus petit degré des parités
+
+  for v in range(length):
+    for k in range(vdeg[v]):
+      if k == 0:
+        # Première arête : toute parité de degré minimal
+        while bstart[dmin] == bstart[dmin+1]: dmin += 1
+        size = bstart[dmin+1] - bstart[dmin]
+        c = order[bstart[dmin] + np.random.randint(size)]
+      else:
+        # Recherche en largeur depuis v dans le graphe courant
+        stamp += 1
+        vmark[v] = stamp
+        for i in range(k):
+          queue[i] = echk[vstart[v] + i]
+          cmark[queue[i]] = stamp
+        head = 0
+        tail = k
+        depth = 0
+        while True:
+          if 0 <= maxdepth <= depth:
+            last = False
+            break
+          newtail = tail
+          for i in range(head, tail):
+            e = chead[queue[i]]
+            while e >= 0:
+              u = evar[e]           # u < v : arêtes toutes placées
+              if vmark[u] != stamp:
+                vmark[u] = stamp
+                for f in range(vstart[u], vstart[u+1]):
+                  c = echk[f]
+                  if cmark[c] != stamp:
+                    cmark[c] = stamp
+                    queue[newtail] = c
+                    newtail += 1
+              e = enext[e]
+          if newtail == tail:   # L'ensemble atteint est stable
+            last = False
+            break
+          if newtail == nchecks: # Tout est atteint : on prend le
+            last = True          # dernier niveau
+            head = tail
+            tail = newtail
+            break
+          head = tail
+          tail = newtail
+          depth += 1
+
+        if last:
+          c = numba_argmin(cdeg, queue[head:tail], tail - head)
+        else:
+          # Parités non atteintes, toutes marquées dans queue[:tail]
+          for i in range(tail): reached[cdeg[queue[i]]] += 1
+          c = numba_unreached(order, bstart, cmark, stamp, reached, dmin,
+                              candidates)
+          for i in range(tail): reached[cdeg[queue[i]]] = 0
+          if c < 0:
+            raise ValueError('no check left for a variable')
+
+      e = vstart[v] + k
+      echk[e] = c
+      enext[e] = chead[c]
+      chead[c] = e
+
+      # c passe du seau d au seau d+1 : échange avec la dernière
+      # parité du seau d, qui devient la première du seau d+1
+      d = cdeg[c]
+      j = bstart[d+1] - 1
+      o = order[j]
+      order[where[c]] = o
+      where[o] = where[c]
+      order[j] = c
+      where[c] = j
+      bstart[d+1] = j
+      cdeg[c] += 1
+
+
+
+@jit(nopython=True, cache=True)
+def numba_mackay(echk, vdegree):
+  # Affectation aléatoire des prises des parités aux arêtes
+  np.random.shuffle(echk)
+
+  # Suppression des arêtes doubles par échanges aléatoires
+  nedges = echk.size
+  for attempt in range(100):
+    fixed = True
+    for e in range(nedges):
+      v = e // vdegree
+      double = False
+      for f in range(v * vdegree, e):
+        if echk[f] == echk[e]: double = True
+      if not double: continue
+      fixed = False
+      f = np.random.randint(nedges)
+      u = f // vdegree
+      ok = u != v
+      for g in range(u * vdegree, (u+1) * vdegree):
+        if echk[g] == echk[e]: ok = False
+      for g in range(v * vdegree, (v+1) * vdegree):
+        if echk[g] == echk[f]: ok = False
+      if ok: echk[e], echk[f] = echk[f], echk[e]
+    if fixed: return
+  raise ValueError('could not remove double edges')
+
+
+
+if __name__ == '__main__':
+  import argparse
+  import time
+
+  parser = argparse.ArgumentParser()
+  parser.add_argument('length', type=int, help='longueur du code')
+  parser.add_argument('rate', type=float, help='rendement du code')
+  parser.add_argument('vdegrees',
+                      help='degré des variables ou distribution '
+                      'degré:fraction,... (ex. 2:0.5,3:0.3,8:0.2)')
+  parser.add_argument('codefile', help='fichier du code construit')
+  parser.add_argument('--mackay', action='store_true',
+                      help='construction aléatoire régulière '
+                      '(degré unique seulement)')
+  parser.add_argument('--maxdepth', type=int, default=-1,
+                      help='profondeur maximale de la recherche PEG')
+  parser.add_argument('--seed', type=int, help='graine aléatoire')
+  args = parser.parse_args()
+
+  if ':' in args.vdegrees:
+    if args.mackay:
+      parser.error('--mackay needs a single variable degree')
+    vdegrees = {int(d): float(f) for d, f in
+                (p.split(':') for p in args.vdegrees.split(','))}
+  else:
+    vdegrees = int(args.vdegrees)
+
+  tic = time.time()
+  if args.mackay:
+    code = mackay(args.length, args.rate, vdegrees, args.seed)
+  else:
+    code = peg(args.length, args.rate, vdegrees, args.maxdepth, args.seed)
+  code.save(args.codefile)
+  print(f'# {args.codefile}: {code.length} vars, {code.nchecks} chks, '
+        f'{code.nedges} edges in {time.time() - tic:.2f} s')
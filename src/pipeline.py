@@ -0,0 +1,72 @@
+## Décodage en flux : les trames de LLR sont produites (canal
+## et démappage) dans un fil d'exécution pendant que le
+## décodeur, qui relâche le GIL, travaille dans un autre.
+## Les trames circulent dans des tampons préalloués et
+## recyclés, deux par défaut.
+import queue
+import threading
+import numpy as np
+
+
+def llrfile(path, length):
+  """Retourne les trames de LLR enregistrées en float64 brut
+  dans le fichier `path`, projetées en mémoire, à raison d'une
+  trame de `length` valeurs par ligne. Le résultat peut servir
+  de source à `stream` pour décoder hors ligne des données
+  capturées."""
+  return np.memmap(path, dtype=np.float64, mode='r').reshape(-1, length)
+
+
+def _produce(source, free, full):
+  """Remplit les tampons libres de `free` depuis `source` et les
+  passe au décodeur par `full`. Un tampon `None` arrête la
+  production ; la fin de la source est signalée par `None` et
+  une erreur est transmise telle quelle."""
+  try:
+    frames = None if callable(source) else iter(source)
+    while True:
+      illr = free.get()
+      if illr is None: return
+      if frames is None:
+        source(illr)
+      else:
+        frame = next(frames, None)
+        if frame is None:
+          full.put(None)
+          return
+        np.copyto(illr, frame)
+      full.put(illr)
+  except BaseException as e:
+    full.put(e)
+
+
+def stream(code, source, maxiter, nbuffers=2):
+  """Décode par `code.bp` les trames de `source` et génère pour
+  chacune, dans l'ordre, le nombre d'itérations et les LLR de
+  fin de décodage. La source est soit une fonction `fill(illr)`
+  qui écrit une nouvelle trame dans `illr` (flux infini), soit
+  un itérable de trames comme celui de `llrfile`. Elle est
+  appelée dans un autre fil d'exécution, jusqu'à `nbuffers`
+  trames en avance sur le décodeur.
+
+  Le tableau des LLR de sortie est réutilisé d'une trame à
+  l'autre : il n'est valide que jusqu'à la trame suivante."""
+  free = queue.Queue()
+  full = queue.Queue()
+  for _ in range(nbuffers): free.put(np.zeros(code.length))
+  ollr = np.zeros(code.length)
+
+  producer = threading.Thread(target=_produce, args=(source, free, full),
+                              daemon=True)
+  producer.start()
+  try:
+    while True:
+      illr = full.get()
+      if illr is None: return
+      if isinstance(illr, BaseException): raise illr
+      it = code.bp(illr, ollr, maxiter)
+      free.put(illr)
+      yield it, ollr
+  finally:
+    free.put(None)
+    producer.join()
@@ -0,0 +1,60 @@
+## Profilage par phase de la boucle de simulation. Chaque
+## appel à `lap` impute le temps écoulé depuis l'appel
+## précédent à une phase (bruit, LLR, décodage, comptage) et
+## `count` cumule les itérations et les messages du décodeur.
+## `NoProfiler` a la même interface et ne fait rien : une
+## simulation sans profilage ne paie que des appels vides.
+import time
+
+
+class Profiler:
+  def __init__(self):
+    self.reset()
+
+
+  def reset(self):
+    """Remet à zéro les compteurs, au début d'un point de
+    fonctionnement."""
+    self.times = {}             # Durées cumulées par phase
+    self.frames = 0             # Nombre de trames décodées
+    self.iterations = 0         # Nombre d'itérations du décodeur
+    self.updates = 0            # Nombre de messages calculés
+    self._start = self._tic = time.perf_counter()
+
+
+  def lap(self, phase):
+    """Impute à `phase` le temps écoulé depuis l'appel
+    précédent."""
+    toc = time.perf_counter()
+    self.times[phase] = self.times.get(phase, 0.0) + toc - self._tic
+    self._tic = toc
+
+
+  def count(self, iterations, updates):
+    """Compte une trame décodée en `iterations` itérations et
+    `updates` messages, tels que rangés par `code.bp` dans
+    `code.updates`."""
+    self.frames += 1
+    self.iterations += iterations
+    self.updates += updates
+
+
+  def report(self):
+    """Affiche en commentaire la part de chaque phase, le débit
+    en trames et en messages et le temps moyen par trame."""
+    elapsed = self._tic - self._start
+    total = sum(self.times.values())
+    if elapsed <= 0.0 or total <= 0.0 or self.frames == 0: return
+    phases = ' '.join(f'{p} {t/total:5.1%}' for p, t in self.times.items())
+    print(f'# {phases} | {self.frames/elapsed:.1f} frames/s '
+          f'{self.iterations/self.frames:.2f} it/cw '
+          f'{self.updates/elapsed:.3g} updates/s '
+          f'{elapsed/self.frames*1e6:.1f} us/cw')
+
+
+
+class NoProfiler:
+  def reset(self): pass
+  def lap(self, phase): pass
+  def count(self, iterations, updates): pass
+  def report(self): pass